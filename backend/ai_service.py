@@ -1,6 +1,12 @@
 import os
-from typing import Optional
+import re
+import random
+import asyncio
+import hashlib
+from typing import AsyncIterator, Optional
 import httpx
+import orjson
+from cachetools import TTLCache
 from fastapi import HTTPException
 import logging
 
@@ -8,6 +14,36 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Fallback dispatch tables: one regex pass extracts the rating digit and a
+# dict lookup picks the canned response, instead of repeated substring scans
+_RATING_RE = re.compile(r"rating:\s*([1-5])/5", re.IGNORECASE)
+
+# Transient Groq statuses worth retrying before falling back
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+_MAX_ATTEMPTS = 3
+
+_FALLBACK_USER_DEFAULT = "Thank you for your feedback! We truly appreciate you taking the time to share your thoughts with us."
+_FALLBACK_USER = {
+    5: "Thank you for your positive feedback! We're delighted to hear about your great experience. Your satisfaction is our top priority!",
+    4: "Thank you for your positive feedback! We're delighted to hear about your great experience. Your satisfaction is our top priority!",
+    3: "Thank you for your feedback. We appreciate your input and are always looking for ways to improve our service.",
+    2: "Thank you for sharing your experience with us. We take your feedback seriously and will work to address your concerns.",
+    1: "Thank you for sharing your experience with us. We take your feedback seriously and will work to address your concerns.",
+}
+
+_FALLBACK_ACTIONS_DEFAULT = "1. Immediate follow-up required\n2. Investigate issues mentioned\n3. Offer resolution or compensation\n4. Prevent similar issues"
+_FALLBACK_ACTIONS = {
+    5: "1. Send thank you message\n2. Maintain current service quality\n3. Consider requesting testimonial",
+    4: "1. Send thank you message\n2. Maintain current service quality\n3. Consider requesting testimonial",
+    3: "1. Follow up with customer to understand concerns\n2. Review service processes\n3. Implement improvements",
+}
+
+
+def _extract_rating(user_prompt: str) -> Optional[int]:
+    """Pull the 'Rating: N/5' digit out of the prompt, if present."""
+    match = _RATING_RE.search(user_prompt)
+    return int(match.group(1)) if match else None
+
 
 class AIService:
     """Service for handling all AI/LLM operations."""
@@ -17,7 +53,36 @@ class AIService:
         self.api_base = "https://api.groq.com/openai/v1"
         self.model = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
         self.timeout = 30.0
-        
+
+        # Long-lived client with keep-alive pooling so repeated Groq calls
+        # skip the TCP+TLS handshake. Closed via the app shutdown handler.
+        self.client = httpx.AsyncClient(
+            base_url=self.api_base,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_keepalive_connections=20,
+                max_connections=100,
+                keepalive_expiry=30.0
+            ),
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+        )
+
+        # Bound in-flight Groq requests so bursts of submissions don't open
+        # hundreds of concurrent upstream calls (size to the API tier's RPM)
+        self.sem = asyncio.Semaphore(int(os.getenv("GROQ_MAX_CONCURRENCY", "32")))
+
+        # Exact-match cache: identical (kind, rating, review text) inputs
+        # reuse the previous LLM output instead of re-calling Groq
+        self._cache = TTLCache(maxsize=10_000, ttl=86400)
+
+        # Single-flight map: concurrent calls with the same key await one
+        # shared future instead of each hitting Groq (the cache only covers
+        # repeats over time, not simultaneous duplicates)
+        self._inflight: dict = {}
+
         # Fallback mode if no API key is provided
         self.use_fallback = not self.api_key
         
@@ -26,99 +91,220 @@ class AIService:
         else:
             logger.info(f"Groq AI enabled with model: {self.model}")
     
+    def _cache_key(self, kind: str, rating: Optional[int], review_text: str) -> bytes:
+        """Build an exact-match cache key from the normalized inputs."""
+        normalized = f"{kind}|{rating}|{(review_text or '').strip().lower()}"
+        return hashlib.sha1(normalized.encode()).digest()
+
     async def _call_llm(self, system_prompt: str, user_prompt: str) -> str:
         """
         Internal method to call LLM API with error handling.
         Falls back to rule-based responses if API fails.
         """
+        result = await self._call_llm_api(system_prompt, user_prompt)
+        if result is not None:
+            return result
+        return self._fallback_response(system_prompt, user_prompt)
+
+    async def _cached_call(self, key: bytes, system_prompt: str, user_prompt: str) -> str:
+        """
+        Cache-aware variant of _call_llm. Returns the cached response for a
+        previously seen key; only successful API responses are cached, so
+        fallback output never gets pinned for a day.
+        """
+        cached = self._cache.get(key)
+        if cached is not None:
+            logger.info("LLM cache hit")
+            return cached
+
+        # Single-flight: join an identical request already in progress
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            logger.info("Coalescing duplicate in-flight LLM request")
+            return await inflight
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._call_llm_api(system_prompt, user_prompt)
+            if result is not None:
+                self._cache[key] = result
+                response = result
+            else:
+                response = self._fallback_response(system_prompt, user_prompt)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            # If the owning coroutine was cancelled the future is still
+            # pending; cancel it so joined waiters don't hang forever
+            if not future.done():
+                future.cancel()
+            self._inflight.pop(key, None)
+
+    async def _call_llm_api(self, system_prompt: str, user_prompt: str) -> Optional[str]:
+        """
+        Call the Groq API directly. Returns None when no API key is
+        configured or the call fails, letting callers decide on fallback.
+        """
         if self.use_fallback:
             logger.info("Using fallback response (no API key)")
-            return self._fallback_response(system_prompt, user_prompt)
-        
+            return None
+
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.api_base}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": user_prompt}
-                        ],
-                        "temperature": 0.9,  # Increased for more variety
-                        "max_tokens": 500
-                    }
-                )
-                
+            for attempt in range(_MAX_ATTEMPTS):
+                async with self.sem:
+                    response = await self.client.post(
+                        "/chat/completions",
+                        content=orjson.dumps({
+                            "model": self.model,
+                            "messages": [
+                                {"role": "system", "content": system_prompt},
+                                {"role": "user", "content": user_prompt}
+                            ],
+                            "temperature": 0.9,  # Increased for more variety
+                            "max_tokens": 500
+                        })
+                    )
+
                 if response.status_code == 200:
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     ai_response = data["choices"][0]["message"]["content"].strip()
                     logger.info(f"✓ Groq API call successful")
                     return ai_response
-                else:
-                    logger.error(f"Groq API error: {response.status_code} - {response.text}")
-                    return self._fallback_response(system_prompt, user_prompt)
-                    
+
+                if response.status_code in _RETRYABLE_STATUS and attempt < _MAX_ATTEMPTS - 1:
+                    # Honor Retry-After if present, else exponential backoff + jitter
+                    try:
+                        retry_after = float(response.headers.get("Retry-After", 0) or 0)
+                    except ValueError:
+                        # Retry-After can also be an HTTP-date; use backoff
+                        retry_after = 0.0
+                    delay = retry_after or (0.2 * (2 ** attempt) + random.random() * 0.1)
+                    logger.warning(
+                        f"Groq API {response.status_code}, retrying in {delay:.2f}s "
+                        f"(attempt {attempt + 1}/{_MAX_ATTEMPTS})"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+
+                logger.error(f"Groq API error: {response.status_code} - {response.text}")
+                return None
+
         except Exception as e:
             logger.error(f"Groq API exception: {str(e)}")
-            return self._fallback_response(system_prompt, user_prompt)
+            return None
     
+    async def _stream_llm(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """
+        Stream response tokens from the Groq API as they are generated.
+        Yields the rule-based fallback as a single chunk when the API is
+        unavailable and nothing has been streamed yet.
+        """
+        if self.use_fallback:
+            logger.info("Using fallback response (no API key)")
+            yield self._fallback_response(system_prompt, user_prompt)
+            return
+
+        yielded = False
+        try:
+            async with self.sem:
+                async with self.client.stream(
+                    "POST",
+                    "/chat/completions",
+                    content=orjson.dumps({
+                        "model": self.model,
+                        "messages": [
+                            {"role": "system", "content": system_prompt},
+                            {"role": "user", "content": user_prompt}
+                        ],
+                        "temperature": 0.9,
+                        "max_tokens": 500,
+                        "stream": True
+                    })
+                ) as response:
+                    if response.status_code != 200:
+                        await response.aread()
+                        logger.error(f"Groq API error: {response.status_code}")
+                        yield self._fallback_response(system_prompt, user_prompt)
+                        return
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data: "):
+                            continue
+                        payload = line[len("data: "):]
+                        if payload.strip() == "[DONE]":
+                            break
+                        delta = orjson.loads(payload)["choices"][0]["delta"].get("content")
+                        if delta:
+                            yielded = True
+                            yield delta
+        except Exception as e:
+            logger.error(f"Groq API streaming exception: {str(e)}")
+            if not yielded:
+                yield self._fallback_response(system_prompt, user_prompt)
+
     def _fallback_response(self, system_prompt: str, user_prompt: str) -> str:
         """Rule-based fallback when LLM API is unavailable."""
-        # Normalize for checking
-        user_prompt_lower = user_prompt.lower()
-        
-        if "customer service" in system_prompt.lower() or "friendly" in system_prompt.lower():
-            # User-facing response - check for rating patterns
-            if "rating: 5/5" in user_prompt_lower or "rating: 4/5" in user_prompt_lower:
-                return "Thank you for your positive feedback! We're delighted to hear about your great experience. Your satisfaction is our top priority!"
-            elif "rating: 3/5" in user_prompt_lower:
-                return "Thank you for your feedback. We appreciate your input and are always looking for ways to improve our service."
-            elif "rating: 2/5" in user_prompt_lower or "rating: 1/5" in user_prompt_lower:
-                return "Thank you for sharing your experience with us. We take your feedback seriously and will work to address your concerns."
-            else:
-                return "Thank you for your feedback! We truly appreciate you taking the time to share your thoughts with us."
-        
-        elif "summary" in system_prompt.lower() or "summarize" in system_prompt.lower():
+        system_prompt_lower = system_prompt.lower()
+
+        if "customer service" in system_prompt_lower or "friendly" in system_prompt_lower:
+            # User-facing response - dispatch on the extracted rating
+            rating = _extract_rating(user_prompt)
+            return _FALLBACK_USER.get(rating, _FALLBACK_USER_DEFAULT)
+
+        elif "summary" in system_prompt_lower or "summarize" in system_prompt_lower:
             # Summary generation
-            if not user_prompt or user_prompt.strip() == "" or "no text provided" in user_prompt_lower:
+            if not user_prompt or user_prompt.strip() == "" or "no text provided" in user_prompt.lower():
                 return "No review text provided."
             elif len(user_prompt) > 200:
                 return f"Detailed customer feedback: {user_prompt[:150]}..."
             else:
                 return f"Customer feedback: {user_prompt}"
-        
-        elif "recommended actions" in system_prompt.lower() or "recommendations" in system_prompt.lower():
-            # Recommended actions - check for rating patterns
-            if "rating: 5/5" in user_prompt_lower or "rating: 4/5" in user_prompt_lower:
-                return "1. Send thank you message\n2. Maintain current service quality\n3. Consider requesting testimonial"
-            elif "rating: 3/5" in user_prompt_lower:
-                return "1. Follow up with customer to understand concerns\n2. Review service processes\n3. Implement improvements"
-            else:
-                return "1. Immediate follow-up required\n2. Investigate issues mentioned\n3. Offer resolution or compensation\n4. Prevent similar issues"
-        
+
+        elif "recommended actions" in system_prompt_lower or "recommendations" in system_prompt_lower:
+            # Recommended actions - dispatch on the extracted rating
+            rating = _extract_rating(user_prompt)
+            return _FALLBACK_ACTIONS.get(rating, _FALLBACK_ACTIONS_DEFAULT)
+
         return "Thank you for your feedback! We appreciate your input."
     
-    async def generate_user_response(self, rating: int, review_text: str) -> str:
-        """
-        Generate AI response to show to the user after submission.
-        Handles empty reviews and provides appropriate responses.
-        """
-        system_prompt = """You are a friendly customer service AI. Generate a personalized, 
-        empathetic response to the customer's review. Keep it concise (2-3 sentences). 
+    def _user_response_prompts(self, rating: int, review_text: str) -> tuple:
+        """Build the system/user prompt pair for the user-facing response."""
+        system_prompt = """You are a friendly customer service AI. Generate a personalized,
+        empathetic response to the customer's review. Keep it concise (2-3 sentences).
         Acknowledge their rating and feedback appropriately. Make each response unique and varied."""
-        
+
         if not review_text or review_text.strip() == "":
             user_prompt = f"Rating: {rating}/5. No written review provided."
         else:
             user_prompt = f"Rating: {rating}/5. Review: {review_text}"
-        
+
+        return system_prompt, user_prompt
+
+    async def generate_user_response(self, rating: int, review_text: str) -> str:
+        """
+        Generate AI response to show to the user after submission.
+        Handles empty reviews and provides appropriate responses.
+        """
+        system_prompt, user_prompt = self._user_response_prompts(rating, review_text)
+
         logger.info(f"Generating user response for rating: {rating}")
-        return await self._call_llm(system_prompt, user_prompt)
+        key = self._cache_key("user_response", rating, review_text)
+        return await self._cached_call(key, system_prompt, user_prompt)
+
+    async def stream_user_response(self, rating: int, review_text: str) -> AsyncIterator[str]:
+        """
+        Stream the user-facing response token by token. Bypasses the cache:
+        first-token latency is the point of this path.
+        """
+        system_prompt, user_prompt = self._user_response_prompts(rating, review_text)
+
+        logger.info(f"Streaming user response for rating: {rating}")
+        async for token in self._stream_llm(system_prompt, user_prompt):
+            yield token
     
     async def generate_summary(self, review_text: str) -> str:
         """
@@ -134,8 +320,9 @@ class AIService:
         # Truncate very long reviews for API
         truncated_text = review_text[:2000] if len(review_text) > 2000 else review_text
         user_prompt = f"Summarize this review: {truncated_text}"
-        
-        return await self._call_llm(system_prompt, user_prompt)
+
+        key = self._cache_key("summary", None, review_text)
+        return await self._cached_call(key, system_prompt, user_prompt)
     
     async def generate_recommended_actions(self, rating: int, review_text: str, summary: str) -> str:
         """
@@ -150,5 +337,6 @@ Review: {review_text if review_text else 'No text provided'}
 Summary: {summary}
 
 What actions should the business take?"""
-        
-        return await self._call_llm(system_prompt, user_prompt)
+
+        key = self._cache_key("recommended_actions", rating, review_text)
+        return await self._cached_call(key, system_prompt, user_prompt)
@@ -1,24 +1,46 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager
 import uvicorn
 from dotenv import load_dotenv
+import asyncio
 import os
+import orjson
 from functools import lru_cache
 
 # Load environment variables from .env file
 load_dotenv()
 
-from database import get_db, engine, Base
+from database import get_db, get_async_db, engine, Base, SessionLocal
 from models import Review
-from schemas import ReviewCreate, ReviewResponse, AdminReviewResponse
+from schemas import ReviewCreate, ReviewResponse, ADMIN_LIST_ADAPTER
 from ai_service import AIService
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="AI Feedback System", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create tables (unless disabled) and build the AIService once the event
+    loop is running; close its pooled httpx client on shutdown. Set
+    AUTO_CREATE_TABLES=0 in production and run migrations out-of-band.
+    """
+    if os.getenv("AUTO_CREATE_TABLES", "1") == "1":
+        Base.metadata.create_all(bind=engine)
+    app.state.ai = AIService()
+    yield
+    await app.state.ai.client.aclose()
+
+
+app = FastAPI(
+    title="AI Feedback System",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
 
 # Log environment status
 import logging
@@ -35,7 +57,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-ai_service = AIService()
+def get_ai(request: Request) -> AIService:
+    """Dependency for the per-worker AIService built in the lifespan."""
+    return request.app.state.ai
+
+
+# One-pass rating aggregate shared by the analytics and insights endpoints:
+# total, average, and all five buckets from a single scan (CASE WHEN instead
+# of FILTER so it works on both SQLite and Postgres)
+RATING_STATS_STMT = select(
+    func.count(Review.id).label("total"),
+    func.avg(Review.rating).label("avg_rating"),
+    *[
+        func.sum(case((Review.rating == r, 1), else_=0)).label(f"rating_{r}")
+        for r in range(1, 6)
+    ]
+)
 
 
 @app.get("/")
@@ -43,44 +80,75 @@ def read_root():
     return {"message": "AI Feedback System API", "version": "1.0.0"}
 
 
+# Strong references to fire-and-forget enrichment tasks: the event loop only
+# holds tasks weakly, so an unreferenced task can be garbage-collected mid-run
+_enrich_tasks: set = set()
+
+
+async def enrich_review(ai: AIService, review_id: int, rating: int, review_text: str):
+    """
+    Background task: generate the admin-only AI fields (summary and
+    recommended actions) and update the stored review.
+    """
+    try:
+        summary = await ai.generate_summary(review_text)
+        recommended_actions = await ai.generate_recommended_actions(
+            rating=rating,
+            review_text=review_text,
+            summary=summary
+        )
+
+        db = SessionLocal()
+        try:
+            db.query(Review).filter(Review.id == review_id).update({
+                "ai_summary": summary,
+                "recommended_actions": recommended_actions
+            })
+            db.commit()
+        finally:
+            db.close()
+    except Exception as e:
+        logger.error(f"Error enriching review {review_id}: {str(e)}")
+
+
 @app.post("/api/reviews", response_model=ReviewResponse, status_code=201)
-async def create_review(review: ReviewCreate, db: Session = Depends(get_db)):
+async def create_review(
+    review: ReviewCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    ai: AIService = Depends(get_ai)
+):
     """
     Submit a new review with rating and text.
-    Returns AI-generated response to the user.
+    Returns AI-generated response to the user; the admin-only summary and
+    recommended actions are generated in a background task after the response.
+
+    Rating bounds are enforced by ReviewCreate (Field ge=1, le=5).
     """
-    # Validate rating
-    if not 1 <= review.rating <= 5:
-        raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
-    
     try:
-        # Generate AI response for user
-        user_response = await ai_service.generate_user_response(
+        # Only the user-facing response blocks the HTTP response
+        user_response = await ai.generate_user_response(
             rating=review.rating,
             review_text=review.review_text
         )
-        
-        # Generate AI summary and recommendations for admin (async processing)
-        summary = await ai_service.generate_summary(review.review_text)
-        recommended_actions = await ai_service.generate_recommended_actions(
-            rating=review.rating,
-            review_text=review.review_text,
-            summary=summary
-        )
-        
-        # Create database entry
+
+        # Create database entry; admin fields are filled in the background
         db_review = Review(
             rating=review.rating,
             review_text=review.review_text,
             user_response=user_response,
-            ai_summary=summary,
-            recommended_actions=recommended_actions
+            ai_summary="",
+            recommended_actions=""
         )
-        
+
         db.add(db_review)
         db.commit()
         db.refresh(db_review)
-        
+
+        background_tasks.add_task(
+            enrich_review, ai, db_review.id, review.rating, review.review_text
+        )
+
         return ReviewResponse(
             id=db_review.id,
             rating=db_review.rating,
@@ -100,14 +168,72 @@ async def create_review(review: ReviewCreate, db: Session = Depends(get_db)):
         )
 
 
-@app.get("/api/admin/reviews", response_model=List[AdminReviewResponse])
-def get_all_reviews(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@app.post("/api/reviews/stream", status_code=201)
+async def create_review_stream(review: ReviewCreate, ai: AIService = Depends(get_ai)):
+    """
+    Streaming variant of review submission. Sends the AI response to the
+    user as server-sent events while it is being generated, then persists
+    the review and schedules the admin enrichment.
+    """
+    async def event_stream():
+        chunks = []
+        async for token in ai.stream_user_response(review.rating, review.review_text):
+            chunks.append(token)
+            yield f"data: {orjson.dumps({'token': token}).decode()}\n\n"
+
+        user_response = "".join(chunks).strip()
+
+        db = SessionLocal()
+        try:
+            db_review = Review(
+                rating=review.rating,
+                review_text=review.review_text,
+                user_response=user_response,
+                ai_summary="",
+                recommended_actions=""
+            )
+            db.add(db_review)
+            db.commit()
+            db.refresh(db_review)
+            review_id = db_review.id
+        finally:
+            db.close()
+
+        task = asyncio.create_task(
+            enrich_review(ai, review_id, review.rating, review.review_text)
+        )
+        _enrich_tasks.add(task)
+        task.add_done_callback(_enrich_tasks.discard)
+
+        yield f"data: {orjson.dumps({'done': True, 'id': review_id}).decode()}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", status_code=201)
+
+
+@app.get("/api/admin/reviews")
+async def get_all_reviews(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """
     Admin endpoint: Get all reviews with AI summaries and recommended actions.
     """
     try:
-        reviews = db.query(Review).order_by(Review.created_at.desc()).offset(skip).limit(limit).all()
-        return reviews
+        # Load exactly the columns AdminReviewResponse exposes, so future
+        # wide columns on Review don't silently inflate this query
+        result = await db.execute(
+            select(Review)
+            .options(load_only(
+                Review.id, Review.rating, Review.review_text,
+                Review.user_response, Review.ai_summary,
+                Review.recommended_actions, Review.created_at
+            ))
+            .order_by(Review.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        reviews = ADMIN_LIST_ADAPTER.validate_python(result.scalars().all())
+        return Response(
+            content=ADMIN_LIST_ADAPTER.dump_json(reviews),
+            media_type="application/json"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -116,23 +242,21 @@ def get_all_reviews(skip: int = 0, limit: int = 100, db: Session = Depends(get_d
 
 
 @app.get("/api/admin/analytics")
-def get_analytics(db: Session = Depends(get_db)):
+async def get_analytics(db: AsyncSession = Depends(get_async_db)):
     """
     Admin endpoint: Get analytics data.
     """
     try:
-        total_reviews = db.query(Review).count()
-        
-        # Count by rating
-        rating_distribution = {}
-        for rating in range(1, 6):
-            count = db.query(Review).filter(Review.rating == rating).count()
-            rating_distribution[f"rating_{rating}"] = count
-        
-        # Average rating
-        from sqlalchemy import func
-        avg_rating = db.query(func.avg(Review.rating)).scalar() or 0
-        
+        # Total, average, and all five buckets from one aggregate query
+        row = (await db.execute(RATING_STATS_STMT)).one()
+
+        total_reviews = row.total
+        avg_rating = float(row.avg_rating or 0)
+        rating_distribution = {
+            f"rating_{rating}": getattr(row, f"rating_{rating}") or 0
+            for rating in range(1, 6)
+        }
+
         # Calculate sentiment percentages
         positive = rating_distribution.get("rating_5", 0) + rating_distribution.get("rating_4", 0)
         neutral = rating_distribution.get("rating_3", 0)
@@ -163,33 +287,38 @@ def get_analytics(db: Session = Depends(get_db)):
 
 
 @app.get("/api/admin/ai-insights")
-async def get_ai_insights(db: Session = Depends(get_db)):
+async def get_ai_insights(db: AsyncSession = Depends(get_async_db), ai: AIService = Depends(get_ai)):
     """
     Admin endpoint: Get AI-powered insights about all reviews.
     """
     try:
-        reviews = db.query(Review).all()
-        
-        if len(reviews) == 0:
+        # Total, average, and all five buckets from one aggregate query
+        row = (await db.execute(RATING_STATS_STMT)).one()
+
+        total = row.total
+        rating_counts = {
+            rating: getattr(row, f"rating_{rating}") or 0
+            for rating in range(1, 6)
+        }
+
+        if total == 0:
             return {
                 "insights": "No reviews available yet. Start collecting feedback to get AI-powered insights!",
                 "strengths": [],
                 "weaknesses": [],
                 "recommendations": []
             }
-        
-        # Gather statistics
-        total = len(reviews)
-        from sqlalchemy import func
-        avg_rating = db.query(func.avg(Review.rating)).scalar() or 0
-        
-        rating_counts = {}
-        for rating in range(1, 6):
-            rating_counts[rating] = db.query(Review).filter(Review.rating == rating).count()
-        
-        # Sample reviews for AI analysis
-        high_rated = db.query(Review).filter(Review.rating >= 4).order_by(Review.created_at.desc()).limit(5).all()
-        low_rated = db.query(Review).filter(Review.rating <= 2).order_by(Review.created_at.desc()).limit(5).all()
+
+        avg_rating = float(row.avg_rating or 0)
+
+        # Sample review texts for AI analysis - only the text column, not
+        # the full rows with their AI-generated Text blobs
+        high_rated = (await db.execute(
+            select(Review.review_text).where(Review.rating >= 4).order_by(Review.created_at.desc()).limit(5)
+        )).scalars().all()
+        low_rated = (await db.execute(
+            select(Review.review_text).where(Review.rating <= 2).order_by(Review.created_at.desc()).limit(5)
+        )).scalars().all()
         
         # Build context for AI
         context = f"""Analyze this customer feedback data:
@@ -204,10 +333,10 @@ Rating Distribution:
 - 1 star: {rating_counts.get(1, 0)} ({rating_counts.get(1, 0)/total*100:.1f}%)
 
 Sample High-Rated Reviews:
-{chr(10).join([f"- {r.review_text[:100]}" for r in high_rated if r.review_text])}
+{chr(10).join([f"- {text[:100]}" for text in high_rated if text])}
 
 Sample Low-Rated Reviews:
-{chr(10).join([f"- {r.review_text[:100]}" for r in low_rated if r.review_text])}
+{chr(10).join([f"- {text[:100]}" for text in low_rated if text])}
 
 Based on this data, provide:
 1. Overall insights about customer satisfaction
@@ -218,7 +347,7 @@ Based on this data, provide:
         system_prompt = """You are a business analytics AI. Analyze customer feedback data and provide actionable insights.
         Be specific, concise, and focus on what the business should do. Use plain text without markdown formatting."""
         
-        ai_response = await ai_service._call_llm(system_prompt, context)
+        ai_response = await ai._call_llm(system_prompt, context)
         
         # Parse the response (simple split by sections)
         sections = ai_response.split("\n\n")
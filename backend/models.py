@@ -1,20 +1,27 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Index
 from sqlalchemy.sql import func
 from database import Base
 
 
 class Review(Base):
     """Database model for storing user reviews and AI-generated content."""
-    
+
     __tablename__ = "reviews"
-    
+
     id = Column(Integer, primary_key=True, index=True)
-    rating = Column(Integer, nullable=False)
+    rating = Column(Integer, nullable=False, index=True)  # Indexed for GROUP BY / rating filters
     review_text = Column(Text, nullable=False)
     user_response = Column(Text, nullable=False)  # AI response shown to user
-    ai_summary = Column(Text, nullable=False)  # AI summary for admin
-    recommended_actions = Column(Text, nullable=False)  # AI recommended actions
+    ai_summary = Column(Text, nullable=True)  # AI summary for admin (filled in background)
+    recommended_actions = Column(Text, nullable=True)  # AI recommended actions (filled in background)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Descending index matches the admin listing's ORDER BY created_at DESC.
+    # For existing deployments, create it once with:
+    #   CREATE INDEX ix_reviews_created_at_desc ON reviews (created_at DESC);
+    __table_args__ = (
+        Index("ix_reviews_created_at_desc", created_at.desc()),
+    )
     
     def __repr__(self):
         return f"<Review(id={self.id}, rating={self.rating})>"
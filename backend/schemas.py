@@ -1,68 +1,77 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+
+# Schema examples built once at import instead of per Config rebuild
+_EXAMPLE_REVIEW_CREATE = {
+    "example": {
+        "rating": 5,
+        "review_text": "Great service! Very satisfied with the experience."
+    }
+}
+
+_EXAMPLE_REVIEW_RESPONSE = {
+    "example": {
+        "id": 1,
+        "rating": 5,
+        "review_text": "Great service!",
+        "user_response": "Thank you for your wonderful feedback!",
+        "created_at": "2026-01-12T10:00:00Z"
+    }
+}
+
+_EXAMPLE_ADMIN_REVIEW_RESPONSE = {
+    "example": {
+        "id": 1,
+        "rating": 5,
+        "review_text": "Great service!",
+        "user_response": "Thank you for your feedback!",
+        "ai_summary": "Customer is highly satisfied with the service.",
+        "recommended_actions": "Continue maintaining service quality.",
+        "created_at": "2026-01-12T10:00:00Z"
+    }
+}
 
 
 class ReviewCreate(BaseModel):
     """Schema for creating a new review."""
+    model_config = ConfigDict(json_schema_extra=_EXAMPLE_REVIEW_CREATE)
+
     rating: int = Field(..., ge=1, le=5, description="Rating from 1 to 5")
     review_text: str = Field(..., min_length=0, max_length=5000, description="User review text")
-    
-    @validator('review_text')
+
+    @field_validator('review_text')
+    @classmethod
     def validate_review_text(cls, v):
         """Handle empty reviews and trim whitespace."""
         return v.strip()
-    
-    class Config:
-        json_schema_extra = {
-            "example": {
-                "rating": 5,
-                "review_text": "Great service! Very satisfied with the experience."
-            }
-        }
 
 
 class ReviewResponse(BaseModel):
     """Schema for review response to user."""
+    model_config = ConfigDict(from_attributes=True, json_schema_extra=_EXAMPLE_REVIEW_RESPONSE)
+
     id: int
     rating: int
     review_text: str
     user_response: str
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
-        json_schema_extra = {
-            "example": {
-                "id": 1,
-                "rating": 5,
-                "review_text": "Great service!",
-                "user_response": "Thank you for your wonderful feedback!",
-                "created_at": "2026-01-12T10:00:00Z"
-            }
-        }
 
 
 class AdminReviewResponse(BaseModel):
     """Schema for admin dashboard - includes AI analysis."""
+    model_config = ConfigDict(from_attributes=True, json_schema_extra=_EXAMPLE_ADMIN_REVIEW_RESPONSE)
+
     id: int
     rating: int
     review_text: str
     user_response: str
-    ai_summary: str
-    recommended_actions: str
+    ai_summary: Optional[str] = None
+    recommended_actions: Optional[str] = None
     created_at: datetime
-    
-    class Config:
-        from_attributes = True
-        json_schema_extra = {
-            "example": {
-                "id": 1,
-                "rating": 5,
-                "review_text": "Great service!",
-                "user_response": "Thank you for your feedback!",
-                "ai_summary": "Customer is highly satisfied with the service.",
-                "recommended_actions": "Continue maintaining service quality.",
-                "created_at": "2026-01-12T10:00:00Z"
-            }
-        }
+
+
+# Built once at import: validates and serializes a whole admin page of ORM
+# rows in one batched call instead of per-row model construction
+ADMIN_LIST_ADAPTER = TypeAdapter(List[AdminReviewResponse])